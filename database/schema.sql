@@ -227,6 +227,82 @@ BEGIN
 END;
 $$ language 'plpgsql';
 
+-- Bulk apply ML analysis results in one statement (used by the ML service).
+-- If any row is malformed (e.g. a non-UUID id), the batch is retried row by row
+-- so only the bad rows are skipped; returns the number of comments updated.
+CREATE OR REPLACE FUNCTION batch_update_comment_analysis(updates JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    updated_count INTEGER := 0;
+    item JSONB;
+BEGIN
+    BEGIN
+        UPDATE public.comments AS c
+        SET sentiment = COALESCE(u.sentiment, c.sentiment),
+            sentiment_score = COALESCE(u.sentiment_score, c.sentiment_score),
+            toxicity_score = COALESCE(u.toxicity_score, c.toxicity_score),
+            themes = COALESCE(u.themes, c.themes),
+            tags = COALESCE(u.tags, c.tags),
+            primary_tag = COALESCE(u.primary_tag, c.primary_tag),
+            emotions = COALESCE(u.emotions, c.emotions),
+            keywords = COALESCE(u.keywords, c.keywords),
+            analysis_completed_at = NOW()
+        FROM jsonb_to_recordset(updates) AS u(
+            id UUID,
+            sentiment TEXT,
+            sentiment_score DECIMAL(3,2),
+            toxicity_score DECIMAL(3,2),
+            themes TEXT[],
+            tags TEXT[],
+            primary_tag TEXT,
+            emotions JSONB,
+            keywords JSONB
+        )
+        WHERE c.id = u.id;
+        
+        GET DIAGNOSTICS updated_count = ROW_COUNT;
+        RETURN updated_count;
+    EXCEPTION WHEN OTHERS THEN
+        RAISE WARNING 'batch_update_comment_analysis: batch failed (%), retrying row by row', SQLERRM;
+    END;
+    
+    FOR item IN SELECT * FROM jsonb_array_elements(updates) LOOP
+        BEGIN
+            UPDATE public.comments AS c
+            SET sentiment = COALESCE(u.sentiment, c.sentiment),
+                sentiment_score = COALESCE(u.sentiment_score, c.sentiment_score),
+                toxicity_score = COALESCE(u.toxicity_score, c.toxicity_score),
+                themes = COALESCE(u.themes, c.themes),
+                tags = COALESCE(u.tags, c.tags),
+                primary_tag = COALESCE(u.primary_tag, c.primary_tag),
+                emotions = COALESCE(u.emotions, c.emotions),
+                keywords = COALESCE(u.keywords, c.keywords),
+                analysis_completed_at = NOW()
+            FROM jsonb_to_record(item) AS u(
+                id UUID,
+                sentiment TEXT,
+                sentiment_score DECIMAL(3,2),
+                toxicity_score DECIMAL(3,2),
+                themes TEXT[],
+                tags TEXT[],
+                primary_tag TEXT,
+                emotions JSONB,
+                keywords JSONB
+            )
+            WHERE c.id = u.id;
+            
+            IF FOUND THEN
+                updated_count := updated_count + 1;
+            END IF;
+        EXCEPTION WHEN OTHERS THEN
+            RAISE WARNING 'batch_update_comment_analysis: skipped comment %: %', item->>'id', SQLERRM;
+        END;
+    END LOOP;
+    
+    RETURN updated_count;
+END;
+$$ language 'plpgsql';
+
 -- Triggers for updated_at
 CREATE TRIGGER update_profiles_updated_at BEFORE UPDATE ON public.profiles
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
@@ -1,8 +1,12 @@
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
+from contextlib import asynccontextmanager
+import asyncio
 import os
+import orjson
 from dotenv import load_dotenv
 import logging
 
@@ -21,11 +25,24 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Maximum number of comments analyzed concurrently in batch jobs
+BATCH_CONCURRENCY = 32
+
+# Longer comments are truncated before analysis to bound regex and API work
+MAX_CONTENT_LENGTH = 3000
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Release pooled connections held by service clients on shutdown."""
+    yield
+    await perspective_client.aclose()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="C2HQ ML Service",
     description="Machine Learning service for comment analysis",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -108,39 +125,62 @@ async def test_tagging(request: CommentAnalysisRequest):
         logger.error(f"Tagging test error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Tagging test failed: {str(e)}")
 
+async def _analyze_one(comment_id: str, content: str) -> Dict[str, Any]:
+    """Run every analyzer over one comment and return the combined result."""
+    logger.info(f"Analyzing comment: {comment_id}")
+    
+    content = content or ""
+    if len(content) > MAX_CONTENT_LENGTH:
+        logger.info(f"Truncating comment {comment_id} from {len(content)} to {MAX_CONTENT_LENGTH} characters")
+        content = content[:MAX_CONTENT_LENGTH]
+    
+    # Perform all analyses
+    sentiment_result = await sentiment_analyzer.analyze(content)
+    toxicity_result = await toxicity_detector.analyze(content)
+    themes = await theme_extractor.extract_themes(content)
+    emotions = await sentiment_analyzer.analyze_emotions(content)
+    tagging_result = await comment_tagger.tag_comment(content)
+    
+    # Use Perspective API for additional toxicity check
+    perspective_toxicity = await perspective_client.analyze_toxicity(content)
+    
+    # Combine toxicity scores (weighted average)
+    combined_toxicity = (toxicity_result * 0.7) + (perspective_toxicity * 0.3)
+    
+    result = {
+        "comment_id": comment_id,
+        "sentiment": sentiment_result["label"],
+        "sentiment_score": sentiment_result["score"],
+        "toxicity_score": combined_toxicity,
+        "themes": themes,
+        "emotions": emotions,
+        "tags": tagging_result["tags"],
+        "primary_tag": tagging_result["primary_tag"],
+        "tag_count": tagging_result["tag_count"]
+    }
+    
+    logger.info(f"Analysis complete for comment: {comment_id}")
+    return result
+
+async def _analyze_many(comments: List[CommentAnalysisRequest]) -> List[Any]:
+    """Analyze comments concurrently; each entry is a result dict or the raised exception."""
+    # Keep a bounded number of comments in flight so Perspective API latency overlaps
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    
+    async def analyze_bounded(comment_req: CommentAnalysisRequest) -> Dict[str, Any]:
+        async with semaphore:
+            return await _analyze_one(comment_req.comment_id, comment_req.content)
+    
+    return await asyncio.gather(
+        *(analyze_bounded(comment_req) for comment_req in comments),
+        return_exceptions=True
+    )
+
 @app.post("/analyze/comment", response_model=CommentAnalysisResponse)
 async def analyze_comment(request: CommentAnalysisRequest):
     """Analyze a single comment for sentiment, toxicity, themes, and tags."""
     try:
-        logger.info(f"Analyzing comment: {request.comment_id}")
-        
-        # Perform all analyses
-        sentiment_result = await sentiment_analyzer.analyze(request.content)
-        toxicity_result = await toxicity_detector.analyze(request.content)
-        themes = await theme_extractor.extract_themes(request.content)
-        emotions = await sentiment_analyzer.analyze_emotions(request.content)
-        tagging_result = await comment_tagger.tag_comment(request.content)
-        
-        # Use Perspective API for additional toxicity check
-        perspective_toxicity = await perspective_client.analyze_toxicity(request.content)
-        
-        # Combine toxicity scores (weighted average)
-        combined_toxicity = (toxicity_result * 0.7) + (perspective_toxicity * 0.3)
-        
-        response = CommentAnalysisResponse(
-            comment_id=request.comment_id,
-            sentiment=sentiment_result["label"],
-            sentiment_score=sentiment_result["score"],
-            toxicity_score=combined_toxicity,
-            themes=themes,
-            emotions=emotions,
-            tags=tagging_result["tags"],
-            primary_tag=tagging_result["primary_tag"],
-            tag_count=tagging_result["tag_count"]
-        )
-        
-        logger.info(f"Analysis complete for comment: {request.comment_id}")
-        return response
+        return CommentAnalysisResponse(**await _analyze_one(request.comment_id, request.content))
         
     except Exception as e:
         logger.error(f"Error analyzing comment {request.comment_id}: {str(e)}")
@@ -159,15 +199,17 @@ async def analyze_batch(request: BatchAnalysisRequest, background_tasks: Backgro
         
         # Process small batches immediately
         results = []
-        for comment_req in request.comments:
-            try:
-                result = await analyze_comment(comment_req)
-                results.append(result)
-            except Exception as e:
-                logger.error(f"Failed to analyze comment {comment_req.comment_id}: {str(e)}")
+        for comment_req, result in zip(request.comments, await _analyze_many(request.comments)):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to analyze comment {comment_req.comment_id}: {str(result)}")
                 continue
+            results.append(result)
         
-        return {"results": results, "status": "completed"}
+        # Results are plain dicts, so serialize them with orjson directly without a response model
+        return Response(
+            content=orjson.dumps({"results": results, "status": "completed"}),
+            media_type="application/json"
+        )
         
     except Exception as e:
         logger.error(f"Batch analysis error: {str(e)}")
@@ -177,26 +219,24 @@ async def process_batch_analysis(comments: List[CommentAnalysisRequest]):
     """Background task for processing large batches."""
     logger.info(f"Processing batch of {len(comments)} comments in background")
     
-    for comment_req in comments:
-        try:
-            result = await analyze_comment(comment_req)
-            
-            # Update database with results
-            await supabase_client.update_comment_analysis(
-                comment_req.comment_id,
-                {
-                    "sentiment": result.sentiment,
-                    "sentiment_score": result.sentiment_score,
-                    "toxicity_score": result.toxicity_score,
-                    "themes": result.themes,
-                    "emotions": result.emotions,
-                    "analysis_completed_at": "now()"
-                }
-            )
-            
-        except Exception as e:
-            logger.error(f"Failed to process comment {comment_req.comment_id}: {str(e)}")
+    rows = []
+    for comment_req, result in zip(comments, await _analyze_many(comments)):
+        if isinstance(result, Exception):
+            logger.error(f"Failed to process comment {comment_req.comment_id}: {str(result)}")
             continue
+        
+        rows.append({
+            "id": comment_req.comment_id,
+            "sentiment": result["sentiment"],
+            "sentiment_score": result["sentiment_score"],
+            "toxicity_score": result["toxicity_score"],
+            "themes": result["themes"],
+            "emotions": result["emotions"]
+        })
+    
+    # Update database with results
+    if rows:
+        await supabase_client.batch_update_comments(rows)
     
     logger.info("Batch analysis completed")
 
@@ -212,4 +252,13 @@ async def retrain_sentiment_model():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    # "auto" resolves to uvloop and httptools when uvicorn[standard] installed them (Linux/macOS)
+    # and falls back to asyncio/h11 elsewhere; workers need the app as an import string
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="auto",
+        http="auto",
+        workers=os.cpu_count()
+    ) 
\ No newline at end of file
@@ -1,117 +1,254 @@
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Set, Tuple
 import logging
 import asyncio
+import threading
+import ahocorasick
+from services.hyperscan_cache import compile_database, hyperscan, scan
 
 logger = logging.getLogger(__name__)
 
+# Patterns written as a word-bounded alternation: \b(word|phrase|...)\b
+_WORD_GROUP = re.compile(r"\\b\((.*)\)\\b")
+_REGEX_META = re.compile(r"[\\.^$*+?{}\[\]()|]")
+
+# Characters that must appear in the text for a residual regex to match
+_GATE_CHARS = (":", "@")
+
+def _split_alternatives(body: str) -> Optional[List[str]]:
+    """Split a regex body on its top-level "|", or return None if its groups are unbalanced."""
+    alternatives, depth, start, escaped = [], 0, 0, False
+    for i, char in enumerate(body):
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth < 0:
+                return None
+        elif char == "|" and depth == 0:
+            alternatives.append(body[start:i])
+            start = i + 1
+    
+    alternatives.append(body[start:])
+    return alternatives if depth == 0 else None
+
+def _split_literals(pattern: str) -> Tuple[List[str], List[Tuple[Optional[str], str]]]:
+    """Split a tag pattern into plain keywords and (gate, regex) pairs for what is left over."""
+    match = _WORD_GROUP.fullmatch(pattern)
+    alternatives = _split_alternatives(match.group(1)) if match else None
+    if not alternatives:
+        return [], [(None, pattern)]
+    
+    literals, residual = [], []
+    for alternative in alternatives:
+        # \b only acts as a plain word boundary around keywords that start and end with word characters
+        if _REGEX_META.search(alternative) or not (alternative[0].isalnum() and alternative[-1].isalnum()):
+            # Ignore the ":" of non-capturing groups when looking for a gate character
+            plain = alternative.replace("(?:", "(")
+            gate = next((char for char in _GATE_CHARS if char in plain), None)
+            residual.append((gate, rf"\b(?:{alternative})\b"))
+        else:
+            literals.append(alternative)
+    
+    return literals, residual
+
+def _is_word_char(text: str, index: int) -> bool:
+    """Check whether text[index] exists and counts as a regex word character."""
+    return 0 <= index < len(text) and (text[index].isalnum() or text[index] == "_")
+
+def _build_keyword_matchers(tag_patterns: Dict[str, List[str]]):
+    """Build the keyword automaton and each category's gated residual regexes."""
+    # Keywords are matched in one Aho-Corasick pass; only the regex leftovers
+    # (timestamps, mentions, emoji) are searched with re, and only when
+    # their gate character (":" or "@") appears in the text
+    keyword_categories = {}
+    residual = {}
+    for category, patterns in tag_patterns.items():
+        gated = {}
+        for pattern in patterns:
+            literals, leftover = _split_literals(pattern)
+            for literal in literals:
+                keyword_categories.setdefault(literal.casefold(), set()).add(category)
+            for gate, regex in leftover:
+                gated.setdefault(gate, []).append(regex)
+        if gated:
+            # Patterns are written in lowercase and run against casefolded text,
+            # so no IGNORECASE is needed (keeps sre's literal-prefix fast path)
+            residual[category] = [
+                (gate, re.compile("|".join(f"(?:{p})" for p in regexes)))
+                for gate, regexes in gated.items()
+            ]
+    
+    automaton = ahocorasick.Automaton()
+    for keyword, categories in keyword_categories.items():
+        automaton.add_word(keyword, (len(keyword), frozenset(categories)))
+    automaton.make_automaton()
+    
+    return automaton, residual
+
+def _build_hyperscan_db(tag_patterns: Dict[str, List[str]]):
+    """Compile each category's union into one Hyperscan database keyed by category index."""
+    if hyperscan is None:
+        return None
+    
+    # Hyperscan's \b is ASCII-only (UCP mode does not support it), so only ASCII text is scanned with it
+    flags = hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH | hyperscan.HS_FLAG_UTF8
+    expressions = [
+        "|".join(f"(?:{p})" for p in patterns).encode("utf-8")
+        for patterns in tag_patterns.values()
+    ]
+    try:
+        return compile_database(expressions, flags)
+    except Exception as e:
+        logger.warning(f"Hyperscan unavailable, falling back to Aho-Corasick: {str(e)}")
+        return None
+
 class CommentTagger:
     """Keyword-based comment tagging service."""
     
+    # Keyword patterns for each category
+    TAG_PATTERNS = {
+        "Product Praise": [
+            r"\b(love|great|amazing|awesome|fantastic|excellent|brilliant|perfect|wonderful|outstanding|superb|incredible|helpful|useful|beneficial|valuable|thanks|thank you|appreciate|grateful)\b",
+            r"\b(best|favorite|top|outstanding|phenomenal|spectacular|marvelous|splendid|magnificent)\b"
+        ],
+        "Feature Request": [
+            r"\b(i wish|can you add|would be better if|please include|please add|could you add|it would be great if|would love to see|hope you add|suggest adding)\b",
+            r"\b(feature request|new feature|missing feature|add support for|implement|add option for)\b"
+        ],
+        "Hate Speech": [
+            r"\b(kill yourself|die|hate you|you suck|you're stupid|you're dumb|you're an idiot|you're worthless|you're trash|you're garbage|you're useless|you're pathetic|you're a joke|you're a loser)\b",
+            r"\b(fuck you|fuck off|go to hell|burn in hell|rot in hell|piece of shit|worthless piece of shit|stupid ass|dumb ass|idiot|moron|retard)\b"
+        ],
+        "Feedback": [
+            r"\b(feedback|suggestion|improvement|constructive|criticism|advice|tip|recommendation|input|comment|thought|idea)\b",
+            r"\b(could be better|needs improvement|suggest|recommend|consider|think about|maybe try|perhaps|might want to)\b"
+        ],
+        "Confusion/Question": [
+            r"\b(what|how|why|when|where|who|which|can you explain|i don't understand|confused|unclear|not sure|what's going on|how do i|what does this mean)\b",
+            r"\b(help|clarify|explain|elaborate|what do you mean|i'm confused|not clear|unclear|puzzled)\b"
+        ],
+        "Spam": [
+            r"\b(check out my|visit my|follow me|subscribe to my|my channel|my video|my content|my website|my blog|my instagram|my tiktok|my twitter)\b",
+            r"\b(promote|advertisement|sponsored|paid|commission|affiliate|link in bio|click here|buy now|limited time|offer|deal|discount)\b",
+            r"\b(bot|automated|script|program|algorithm|auto-generated|spam|repetitive|copied|duplicate)\b"
+        ],
+        "Callout": [
+            r"\b(error|mistake|wrong|incorrect|false|misleading|inaccurate|false information|wrong info|not true|that's wrong|you're wrong|incorrect|mistake|error|bug|glitch|problem|issue)\b",
+            r"\b(misquote|misquoted|taken out of context|misinterpreted|misunderstood|misrepresented)\b"
+        ],
+        "Timestamp Reference": [
+            r"\b(timestamp|\d{1,2}:\d{2}|\d+:\d+ had me|(?:minute|second) \d+)\b",
+            r"\b((?:at|time|mark|around|near|about) \d+:\d+)\b"
+        ],
+        "Requests/Ideas": [
+            r"\b(do a part 2|make another|next video|cover this|you have to check out|you should try|you need to see|you must visit|you have to go to|recommend|suggest|idea for|next time|in the future)\b",
+            r"\b(restaurant|cafe|place|location|spot|venue|establishment|joint|eatery|dining|food|meal|dish|cuisine)\b"
+        ],
+        "Praise for Creator": [
+            r"\b(you're amazing|you're awesome|you're great|you're the best|love your channel|love you|you're incredible|you're wonderful|you're fantastic|you're brilliant|you're perfect|you're outstanding)\b",
+            r"\b(creator|youtuber|influencer|content creator|host|presenter|speaker|teacher|instructor|guide|mentor|role model)\b"
+        ],
+        "Praise for Video": [
+            r"\b(this edit|this video|this content|this episode|this tutorial|this guide|this explanation|this demonstration|this presentation|this lesson|this class|this session)\b",
+            r"\b(editing|production|quality|cinematography|filming|recording|audio|visual|graphics|effects|transitions|music|sound)\b"
+        ],
+        "Community Interaction": [
+            r"\b(@\w+|tag|mention|reply to|respond to|answer|respond|reply|comment on|discuss|debate|conversation|dialogue|exchange)\b",
+            r"\b(other video|another video|previous video|last video|next video|related video|similar video|check out|watch|see also|also see)\b"
+        ],
+        "Inside Joke/Meme": [
+            r"\b(meme|joke|funny|hilarious|lol|lmao|rofl|haha|😂|😅|😆|😄|😁|😊|😋|😎|🤣|😭|😱|😤|😤|😤)\b",
+            r"\b(reference|callback|throwback|nostalgia|remember when|good times|classic|legendary|iconic|famous|viral|trending)\b"
+        ],
+        "Sensitive Topics": [
+            r"\b(politics|political|government|election|vote|democrat|republican|liberal|conservative|left|right|progressive|traditional)\b",
+            r"\b(religion|religious|god|jesus|christ|bible|church|mosque|temple|prayer|faith|belief|spiritual|divine|holy|sacred)\b",
+            r"\b(abortion|contraception|birth control|pregnancy|reproductive|pro-choice|pro-life|women's rights|gender|sexuality|lgbtq|transgender|non-binary)\b"
+        ],
+        "Potential Conflict": [
+            r"\b(argument|debate|dispute|conflict|controversy|disagreement|opposition|rivalry|competition|fight|battle|war|attack|defend|defense|offensive|aggressive|hostile|angry|mad|furious|enraged)\b",
+            r"\b(triggered|offended|upset|annoyed|irritated|frustrated|disappointed|disgusted|appalled|shocked|outraged|infuriated)\b"
+        ],
+        "Toxicity": [
+            r"\b(toxic|poisonous|harmful|damaging|destructive|negative|hostile|aggressive|abusive|insulting|offensive|disrespectful|rude|mean|cruel|harsh|brutal|vicious|malicious|spiteful|hateful)\b",
+            r"\b(trigger|triggered|snowflake|sensitive|easily offended|overreacting|dramatic|exaggerating|making a big deal|blowing things out of proportion)\b"
+        ]
+    }
+    
+    # Tags implied by another detected tag
+    DERIVED_TAGS = {
+        "Hate Speech": {"Toxicity"},
+        "Sensitive Topics": {"Potential Conflict"}
+    }
+    
     def __init__(self):
-        # Define keyword patterns for each category
-        self.tag_patterns = {
-            "Product Praise": [
-                r"\b(love|great|amazing|awesome|fantastic|excellent|brilliant|perfect|wonderful|outstanding|superb|incredible|helpful|useful|beneficial|valuable|thanks|thank you|appreciate|grateful)\b",
-                r"\b(best|favorite|top|outstanding|phenomenal|spectacular|marvelous|splendid|magnificent)\b"
-            ],
-            "Feature Request": [
-                r"\b(i wish|can you add|would be better if|please include|please add|could you add|it would be great if|would love to see|hope you add|suggest adding)\b",
-                r"\b(feature request|new feature|missing feature|add support for|implement|add option for)\b"
-            ],
-            "Hate Speech": [
-                r"\b(kill yourself|die|hate you|you suck|you're stupid|you're dumb|you're an idiot|you're worthless|you're trash|you're garbage|you're useless|you're pathetic|you're a joke|you're a loser)\b",
-                r"\b(fuck you|fuck off|go to hell|burn in hell|rot in hell|piece of shit|worthless piece of shit|stupid ass|dumb ass|idiot|moron|retard)\b"
-            ],
-            "Feedback": [
-                r"\b(feedback|suggestion|improvement|constructive|criticism|advice|tip|recommendation|input|comment|thought|idea)\b",
-                r"\b(could be better|needs improvement|suggest|recommend|consider|think about|maybe try|perhaps|might want to)\b"
-            ],
-            "Confusion/Question": [
-                r"\?$",  # Ends with question mark
-                r"\b(what|how|why|when|where|who|which|can you explain|i don't understand|confused|unclear|not sure|what's going on|how do i|what does this mean)\b",
-                r"\b(help|clarify|explain|elaborate|what do you mean|i'm confused|not clear|unclear|puzzled)\b"
-            ],
-            "Spam": [
-                r"\b(check out my|visit my|follow me|subscribe to my|my channel|my video|my content|my website|my blog|my instagram|my tiktok|my twitter)\b",
-                r"\b(promote|advertisement|sponsored|paid|commission|affiliate|link in bio|click here|buy now|limited time|offer|deal|discount)\b",
-                r"\b(bot|automated|script|program|algorithm|auto-generated|spam|repetitive|copied|duplicate)\b"
-            ],
-            "Callout": [
-                r"\b(error|mistake|wrong|incorrect|false|misleading|inaccurate|false information|wrong info|not true|that's wrong|you're wrong|incorrect|mistake|error|bug|glitch|problem|issue)\b",
-                r"\b(misquote|misquoted|taken out of context|misinterpreted|misunderstood|misrepresented)\b"
-            ],
-            "Timestamp Reference": [
-                r"\b(\d{1,2}:\d{2}|timestamp|at \d{1,2}:\d{2}|minute \d+|second \d+|\d+:\d+ had me|at \d+:\d+)\b",
-                r"\b(time \d+:\d+|mark \d+:\d+|around \d+:\d+|near \d+:\d+|about \d+:\d+)\b"
-            ],
-            "Requests/Ideas": [
-                r"\b(do a part 2|make another|next video|cover this|you have to check out|you should try|you need to see|you must visit|you have to go to|recommend|suggest|idea for|next time|in the future)\b",
-                r"\b(restaurant|cafe|place|location|spot|venue|establishment|joint|eatery|dining|food|meal|dish|cuisine)\b"
-            ],
-            "Praise for Creator": [
-                r"\b(you're amazing|you're awesome|you're great|you're the best|love your channel|love you|you're incredible|you're wonderful|you're fantastic|you're brilliant|you're perfect|you're outstanding)\b",
-                r"\b(creator|youtuber|influencer|content creator|host|presenter|speaker|teacher|instructor|guide|mentor|role model)\b"
-            ],
-            "Praise for Video": [
-                r"\b(this edit|this video|this content|this episode|this tutorial|this guide|this explanation|this demonstration|this presentation|this lesson|this class|this session)\b",
-                r"\b(editing|production|quality|cinematography|filming|recording|audio|visual|graphics|effects|transitions|music|sound)\b"
-            ],
-            "Community Interaction": [
-                r"\b(@\w+|tag|mention|reply to|respond to|answer|respond|reply|comment on|discuss|debate|conversation|dialogue|exchange)\b",
-                r"\b(other video|another video|previous video|last video|next video|related video|similar video|check out|watch|see also|also see)\b"
-            ],
-            "Inside Joke/Meme": [
-                r"\b(meme|joke|funny|hilarious|lol|lmao|rofl|haha|😂|😅|😆|😄|😁|😊|😋|😎|🤣|😭|😱|😤|😤|😤)\b",
-                r"\b(reference|callback|throwback|nostalgia|remember when|good times|classic|legendary|iconic|famous|viral|trending)\b"
-            ],
-            "Sensitive Topics": [
-                r"\b(politics|political|government|election|vote|democrat|republican|liberal|conservative|left|right|progressive|traditional)\b",
-                r"\b(religion|religious|god|jesus|christ|bible|church|mosque|temple|prayer|faith|belief|spiritual|divine|holy|sacred)\b",
-                r"\b(abortion|contraception|birth control|pregnancy|reproductive|pro-choice|pro-life|women's rights|gender|sexuality|lgbtq|transgender|non-binary)\b"
-            ],
-            "Potential Conflict": [
-                r"\b(argument|debate|dispute|conflict|controversy|disagreement|opposition|rivalry|competition|fight|battle|war|attack|defend|defense|offensive|aggressive|hostile|angry|mad|furious|enraged)\b",
-                r"\b(triggered|offended|upset|annoyed|irritated|frustrated|disappointed|disgusted|appalled|shocked|outraged|infuriated)\b"
-            ],
-            "Toxicity": [
-                r"\b(toxic|poisonous|harmful|damaging|destructive|negative|hostile|aggressive|abusive|insulting|offensive|disrespectful|rude|mean|cruel|harsh|brutal|vicious|malicious|spiteful|hateful)\b",
-                r"\b(trigger|triggered|snowflake|sensitive|easily offended|overreacting|dramatic|exaggerating|making a big deal|blowing things out of proportion)\b"
-            ]
-        }
+        self.categories = list(self.TAG_PATTERNS)
+        
+        # Bind the process-wide matchers built at import
+        self.residual = _RESIDUAL_PATTERNS
+        self._automaton = _KEYWORD_AUTOMATON
+        self._hs_db = _HYPERSCAN_DB
+        self._hs_local = threading.local()
         
-        logger.info("CommentTagger initialized")
+        logger.info(f"CommentTagger initialized ({'hyperscan' if self._hs_db else 'aho-corasick'} backend)")
+    
+    def _scan_categories(self, text: str) -> Set[str]:
+        """Return matching categories from one Hyperscan pass."""
+        matches = scan(self._hs_db, text.encode("utf-8"), self._hs_local)
+        return {self.categories[category_id] for category_id, _, _ in matches}
+    
+    def _match_categories(self, text: str) -> Set[str]:
+        """Return matching categories from keyword and residual regex matches."""
+        text_lower = text.casefold()
+        found = set()
+        
+        for end, (length, categories) in self._automaton.iter(text_lower):
+            if categories <= found:
+                continue
+            # Keywords must sit on word boundaries, as with \b in the patterns
+            if not _is_word_char(text_lower, end - length) and not _is_word_char(text_lower, end + 1):
+                found |= categories
+        
+        for category, checks in self.residual.items():
+            if category in found:
+                continue
+            for gate, regex in checks:
+                if (gate is None or gate in text_lower) and regex.search(text_lower):
+                    found.add(category)
+                    break
+        
+        return found
     
     async def tag_comment(self, text: str) -> Dict[str, Any]:
         """Tag a comment with relevant categories based on keyword matching."""
         try:
-            text_lower = text.lower()
-            detected_tags = []
+            # Check each category for matches; Hyperscan's \b is ASCII-only, so other
+            # text goes through the Aho-Corasick matcher
+            if self._hs_db is not None and text.isascii():
+                found = self._scan_categories(text)
+            else:
+                found = self._match_categories(text)
             
-            # Check each category for matches
-            for category, patterns in self.tag_patterns.items():
-                for pattern in patterns:
-                    if re.search(pattern, text_lower, re.IGNORECASE):
-                        detected_tags.append(category)
-                        break  # Only add each category once
+            # A trailing question mark needs no regex engine
+            if text.rstrip().endswith("?"):
+                found.add("Confusion/Question")
             
             # Special logic for certain combinations
-            if "Hate Speech" in detected_tags:
-                detected_tags.append("Toxicity")
-            
-            if "Sensitive Topics" in detected_tags:
-                detected_tags.append("Potential Conflict")
+            for category in found & self.DERIVED_TAGS.keys():
+                found |= self.DERIVED_TAGS[category]
             
-            # Remove duplicates while preserving order
-            unique_tags = []
-            for tag in detected_tags:
-                if tag not in unique_tags:
-                    unique_tags.append(tag)
+            # Report tags in category priority order
+            detected_tags = [category for category in self.categories if category in found]
             
             return {
-                "tags": unique_tags,
-                "tag_count": len(unique_tags),
-                "primary_tag": unique_tags[0] if unique_tags else None
+                "tags": detected_tags,
+                "tag_count": len(detected_tags),
+                "primary_tag": detected_tags[0] if detected_tags else None
             }
             
         except Exception as e:
@@ -148,4 +285,9 @@ class CommentTagger:
             "Potential Conflict": "bg-rose-100 text-rose-800",
             "Toxicity": "bg-red-100 text-red-800"
         }
-        return color_map.get(tag, "bg-gray-100 text-gray-800") 
\ No newline at end of file
+        return color_map.get(tag, "bg-gray-100 text-gray-800")
+
+# Matchers are built once per process and shared read-only by every CommentTagger,
+# so workers forked after import (e.g. gunicorn --preload) share them copy-on-write
+_KEYWORD_AUTOMATON, _RESIDUAL_PATTERNS = _build_keyword_matchers(CommentTagger.TAG_PATTERNS)
+_HYPERSCAN_DB = _build_hyperscan_db(CommentTagger.TAG_PATTERNS)
@@ -0,0 +1,79 @@
+import hashlib
+import logging
+import os
+import platform
+import threading
+from typing import List, Tuple
+
+try:
+    import hyperscan
+except ImportError:  # Hyperscan wheels are only published for x86_64
+    hyperscan = None
+
+logger = logging.getLogger(__name__)
+
+# Compiled databases are kept on disk: loading one takes well under a millisecond,
+# while compiling the tagger's patterns takes hundreds of milliseconds per process
+_DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.cache')
+
+def _cache_dir() -> str:
+    """Return the cache directory; read per call since databases are built before .env is loaded."""
+    return os.getenv('HYPERSCAN_CACHE_DIR', _DEFAULT_CACHE_DIR)
+
+def _cache_path(expressions: List[bytes], flags: int) -> str:
+    """Return the cache file for a pattern set, keyed by its expressions, flags and platform."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{hyperscan.__version__}|{platform.machine()}|{flags}".encode('utf-8'))
+    for expression in expressions:
+        digest.update(b"\0" + expression)
+    return os.path.join(_cache_dir(), f"{digest.hexdigest()}.hsdb")
+
+def compile_database(expressions: List[bytes], flags: int):
+    """Load a block-mode database for expressions (ids 0..n-1) from disk, compiling and saving it on a miss."""
+    path = _cache_path(expressions, flags)
+    
+    try:
+        with open(path, 'rb') as f:
+            db = hyperscan.loadb(f.read(), hyperscan.HS_MODE_BLOCK)
+        # Databases are CPU-specific; allocating scratch rejects one built for another host
+        hyperscan.Scratch(db)
+        return db
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"Ignoring unusable Hyperscan cache {path}: {str(e)}")
+    
+    db = hyperscan.Database()
+    db.compile(
+        expressions=expressions,
+        ids=list(range(len(expressions))),
+        elements=len(expressions),
+        flags=[flags] * len(expressions)
+    )
+    
+    try:
+        # Write under a temporary name so concurrent workers never read a partial file
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(hyperscan.dumpb(db))
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.warning(f"Could not save Hyperscan cache {path}: {str(e)}")
+    
+    return db
+
+def scan(db, data: bytes, local: threading.local) -> List[Tuple[int, int, int]]:
+    """Return (pattern id, start, end) byte offsets for every match of db in data."""
+    # Scratch space is not thread-safe, so keep one per thread in the caller's local
+    scratch = getattr(local, 'scratch', None)
+    if scratch is None:
+        scratch = local.scratch = hyperscan.Scratch(db)
+    
+    matches = []
+    
+    def on_match(pattern_id, start, end, flags, context):
+        matches.append((pattern_id, start, end))
+    
+    db.scan(data, match_event_handler=on_match, scratch=scratch)
+    return matches
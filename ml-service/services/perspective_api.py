@@ -3,9 +3,18 @@ import httpx
 import os
 from typing import Dict, Any, Optional
 import logging
+from cachetools import LRUCache
+from services.text_utils import content_key
 
 logger = logging.getLogger(__name__)
 
+# TOXICITY and SEVERE_TOXICITY carry most of the blended score, so the hot path asks for only those
+FAST_ATTRIBUTES = ('TOXICITY', 'SEVERE_TOXICITY')
+ALL_ATTRIBUTES = ('TOXICITY', 'SEVERE_TOXICITY', 'IDENTITY_ATTACK', 'INSULT', 'PROFANITY', 'THREAT')
+
+# Perspective rejects comments longer than this
+MAX_TEXT_LENGTH = 20480
+
 class PerspectiveAPIClient:
     """Client for Google Perspective API toxicity detection."""
     
@@ -14,68 +23,74 @@ class PerspectiveAPIClient:
         self.base_url = 'https://commentanalyzer.googleapis.com/v1alpha1/comments:analyze'
         self.timeout = 30.0
         
+        # Shared client so calls reuse pooled keep-alive (HTTP/2) connections
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            http2=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+            headers={'Content-Type': 'application/json'}
+        )
+        
+        # Toxicity scores of previously seen comment text
+        self._cache = LRUCache(maxsize=50_000)
+        
         if not self.api_key:
             logger.warning("Google Perspective API key not found. Toxicity detection will use fallback method.")
         else:
             logger.info("PerspectiveAPIClient initialized")
     
+    def _build_payload(self, text: str, attributes: tuple) -> Dict[str, Any]:
+        """Build an analyze request for the given attributes."""
+        if len(text) > MAX_TEXT_LENGTH:
+            logger.info(f"Truncating text from {len(text)} to {MAX_TEXT_LENGTH} characters for Perspective API")
+            text = text[:MAX_TEXT_LENGTH]
+        
+        return {
+            'requestedAttributes': {attribute: {} for attribute in attributes},
+            'comment': {
+                'text': text
+            },
+            'languages': ['en'],
+            'doNotStore': True
+        }
+    
     async def analyze_toxicity(self, text: str) -> float:
         """Analyze toxicity using Google Perspective API."""
         if not self.api_key:
             logger.warning("No API key available, returning default toxicity score")
             return 0.0
         
+        key = content_key(text)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                payload = {
-                    'requestedAttributes': {
-                        'TOXICITY': {},
-                        'SEVERE_TOXICITY': {},
-                        'IDENTITY_ATTACK': {},
-                        'INSULT': {},
-                        'PROFANITY': {},
-                        'THREAT': {}
-                    },
-                    'comment': {
-                        'text': text
-                    },
-                    'languages': ['en']
-                }
+            payload = self._build_payload(text, FAST_ATTRIBUTES)
+            
+            response = await self._client.post(
+                self.base_url,
+                params={'key': self.api_key},
+                json=payload
+            )
+            
+            if response.status_code == 200:
+                data = response.json()
+                scores = data.get('attributeScores', {})
                 
-                response = await client.post(
-                    f"{self.base_url}?key={self.api_key}",
-                    json=payload,
-                    headers={'Content-Type': 'application/json'}
-                )
+                # Extract toxicity scores
+                toxicity = scores.get('TOXICITY', {}).get('summaryScore', {}).get('value', 0)
+                severe_toxicity = scores.get('SEVERE_TOXICITY', {}).get('summaryScore', {}).get('value', 0)
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    scores = data.get('attributeScores', {})
-                    
-                    # Extract toxicity scores
-                    toxicity = scores.get('TOXICITY', {}).get('summaryScore', {}).get('value', 0)
-                    severe_toxicity = scores.get('SEVERE_TOXICITY', {}).get('summaryScore', {}).get('value', 0)
-                    identity_attack = scores.get('IDENTITY_ATTACK', {}).get('summaryScore', {}).get('value', 0)
-                    insult = scores.get('INSULT', {}).get('summaryScore', {}).get('value', 0)
-                    profanity = scores.get('PROFANITY', {}).get('summaryScore', {}).get('value', 0)
-                    threat = scores.get('THREAT', {}).get('summaryScore', {}).get('value', 0)
-                    
-                    # Weighted combination of scores
-                    combined_score = (
-                        toxicity * 0.4 +
-                        severe_toxicity * 0.3 +
-                        identity_attack * 0.1 +
-                        insult * 0.1 +
-                        profanity * 0.05 +
-                        threat * 0.05
-                    )
-                    
-                    return min(combined_score, 1.0)
+                # Weighted combination of scores (same 4:3 ratio as the full blend)
+                combined_score = min(toxicity * 0.57 + severe_toxicity * 0.43, 1.0)
+                self._cache[key] = combined_score
+                return combined_score
+            
+            else:
+                logger.error(f"Perspective API error: {response.status_code} - {response.text}")
+                return 0.0
                 
-                else:
-                    logger.error(f"Perspective API error: {response.status_code} - {response.text}")
-                    return 0.0
-                    
         except asyncio.TimeoutError:
             logger.error("Perspective API timeout")
             return 0.0
@@ -97,44 +112,34 @@ class PerspectiveAPIClient:
             }
         
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                payload = {
-                    'requestedAttributes': {
-                        'TOXICITY': {},
-                        'SEVERE_TOXICITY': {},
-                        'IDENTITY_ATTACK': {},
-                        'INSULT': {},
-                        'PROFANITY': {},
-                        'THREAT': {}
-                    },
-                    'comment': {
-                        'text': text
-                    },
-                    'languages': ['en']
-                }
+            payload = self._build_payload(text, ALL_ATTRIBUTES)
+            
+            response = await self._client.post(
+                self.base_url,
+                params={'key': self.api_key},
+                json=payload
+            )
+            
+            if response.status_code == 200:
+                data = response.json()
+                scores = data.get('attributeScores', {})
                 
-                response = await client.post(
-                    f"{self.base_url}?key={self.api_key}",
-                    json=payload,
-                    headers={'Content-Type': 'application/json'}
-                )
+                return {
+                    'toxicity': scores.get('TOXICITY', {}).get('summaryScore', {}).get('value', 0),
+                    'severe_toxicity': scores.get('SEVERE_TOXICITY', {}).get('summaryScore', {}).get('value', 0),
+                    'identity_attack': scores.get('IDENTITY_ATTACK', {}).get('summaryScore', {}).get('value', 0),
+                    'insult': scores.get('INSULT', {}).get('summaryScore', {}).get('value', 0),
+                    'profanity': scores.get('PROFANITY', {}).get('summaryScore', {}).get('value', 0),
+                    'threat': scores.get('THREAT', {}).get('summaryScore', {}).get('value', 0)
+                }
+            else:
+                logger.error(f"Perspective API error: {response.status_code}")
+                return {'error': f'API error: {response.status_code}'}
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    scores = data.get('attributeScores', {})
-                    
-                    return {
-                        'toxicity': scores.get('TOXICITY', {}).get('summaryScore', {}).get('value', 0),
-                        'severe_toxicity': scores.get('SEVERE_TOXICITY', {}).get('summaryScore', {}).get('value', 0),
-                        'identity_attack': scores.get('IDENTITY_ATTACK', {}).get('summaryScore', {}).get('value', 0),
-                        'insult': scores.get('INSULT', {}).get('summaryScore', {}).get('value', 0),
-                        'profanity': scores.get('PROFANITY', {}).get('summaryScore', {}).get('value', 0),
-                        'threat': scores.get('THREAT', {}).get('summaryScore', {}).get('value', 0)
-                    }
-                else:
-                    logger.error(f"Perspective API error: {response.status_code}")
-                    return {'error': f'API error: {response.status_code}'}
-                    
         except Exception as e:
             logger.error(f"Perspective API detailed analysis error: {str(e)}")
-            return {'error': str(e)} 
\ No newline at end of file
+            return {'error': str(e)}
+    
+    async def aclose(self) -> None:
+        """Close the shared HTTP client and its pooled connections."""
+        await self._client.aclose()
@@ -1,55 +1,69 @@
-import asyncio
-from typing import Dict, Any
+from types import MappingProxyType
+from typing import Dict, Any, List
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-from textblob import TextBlob
+from cachetools import LRUCache
 import logging
+from services.text_utils import content_key
 
 logger = logging.getLogger(__name__)
 
+# One process-wide VADER instance: the lexicon is read from disk once and, frozen
+# read-only, is shared copy-on-write by workers forked after import
+_VADER = SentimentIntensityAnalyzer()
+_VADER.lexicon = MappingProxyType(_VADER.lexicon)
+_VADER.emojis = MappingProxyType(_VADER.emojis)
+
+# Share of VADER's negative score given to each negative emotion, and of |compound| to surprise
+_ANGER_WEIGHT = 0.8
+_SADNESS_WEIGHT = 0.6
+_FEAR_WEIGHT = 0.4
+_DISGUST_WEIGHT = 0.7
+_SURPRISE_WEIGHT = 0.3
+_NEGATIVE_WEIGHT = _ANGER_WEIGHT + _SADNESS_WEIGHT + _FEAR_WEIGHT + _DISGUST_WEIGHT
+
 class SentimentAnalyzer:
-    """Sentiment analysis service using multiple approaches."""
+    """Sentiment analysis service using VADER."""
     
     def __init__(self):
-        self.vader_analyzer = SentimentIntensityAnalyzer()
+        self.vader_analyzer = _VADER
+        # Duplicate comments ("First!", emoji spam) skip analysis entirely
+        self._cache = LRUCache(maxsize=50_000)
         logger.info("SentimentAnalyzer initialized")
     
     async def analyze(self, text: str) -> Dict[str, Any]:
-        """Analyze sentiment of text using VADER and TextBlob."""
+        """Analyze sentiment of text using VADER."""
+        return self._analyze_sync(text)
+    
+    def _analyze_sync(self, text: str) -> Dict[str, Any]:
+        """Synchronous sentiment analysis shared by single and batch calls."""
+        key = content_key(text)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        
         try:
             # VADER sentiment analysis
             vader_scores = self.vader_analyzer.polarity_scores(text)
-            
-            # TextBlob sentiment analysis
-            blob = TextBlob(text)
-            textblob_polarity = blob.sentiment.polarity
-            textblob_subjectivity = blob.sentiment.subjectivity
-            
-            # Combine scores and determine overall sentiment
             compound_score = vader_scores['compound']
             
-            # Weighted combination of VADER and TextBlob
-            combined_score = (compound_score * 0.7) + (textblob_polarity * 0.3)
-            
             # Determine sentiment label
-            if combined_score >= 0.05:
+            if compound_score >= 0.05:
                 sentiment_label = "positive"
-            elif combined_score <= -0.05:
+            elif compound_score <= -0.05:
                 sentiment_label = "negative"
             else:
                 sentiment_label = "neutral"
             
-            return {
+            result = {
                 "label": sentiment_label,
-                "score": combined_score,
-                "confidence": abs(combined_score),
+                "score": compound_score,
+                "confidence": abs(compound_score),
                 "details": {
-                    "vader": vader_scores,
-                    "textblob": {
-                        "polarity": textblob_polarity,
-                        "subjectivity": textblob_subjectivity
-                    }
+                    "vader": vader_scores
                 }
             }
+            self._cache[key] = result
+            return result
             
         except Exception as e:
             logger.error(f"Sentiment analysis error: {str(e)}")
@@ -63,24 +77,27 @@ class SentimentAnalyzer:
     async def analyze_emotions(self, text: str) -> Dict[str, float]:
         """Analyze emotional content using VADER's emotion scores."""
         try:
-            vader_scores = self.vader_analyzer.polarity_scores(text)
+            # Reuse the VADER scores from analyze() when this text was just analyzed
+            cached = self._cache.get(content_key(text))
+            vader_scores = cached["details"]["vader"] if cached else self.vader_analyzer.polarity_scores(text)
             
-            # Map VADER scores to emotion categories
-            emotions = {
-                "joy": max(0, vader_scores['pos']),
-                "anger": max(0, vader_scores['neg'] * 0.8),
-                "sadness": max(0, vader_scores['neg'] * 0.6),
-                "fear": max(0, vader_scores['neg'] * 0.4),
-                "surprise": abs(vader_scores['compound']) * 0.3,
-                "disgust": max(0, vader_scores['neg'] * 0.7)
-            }
+            # Map VADER scores to emotion categories (pos/neg are never negative)
+            pos = vader_scores['pos']
+            neg = vader_scores['neg']
+            surprise = abs(vader_scores['compound']) * _SURPRISE_WEIGHT
             
             # Normalize emotions to sum to 1
-            total = sum(emotions.values())
-            if total > 0:
-                emotions = {k: v / total for k, v in emotions.items()}
+            total = pos + neg * _NEGATIVE_WEIGHT + surprise
+            scale = 1.0 / total if total > 0 else 1.0
             
-            return emotions
+            return {
+                "joy": pos * scale,
+                "anger": neg * _ANGER_WEIGHT * scale,
+                "sadness": neg * _SADNESS_WEIGHT * scale,
+                "fear": neg * _FEAR_WEIGHT * scale,
+                "surprise": surprise * scale,
+                "disgust": neg * _DISGUST_WEIGHT * scale
+            }
             
         except Exception as e:
             logger.error(f"Emotion analysis error: {str(e)}")
@@ -93,7 +110,7 @@ class SentimentAnalyzer:
                 "disgust": 0.0
             }
     
-    async def batch_analyze(self, texts: list) -> list:
+    async def batch_analyze(self, texts: List[str]) -> List[Dict[str, Any]]:
         """Analyze multiple texts in batch."""
-        tasks = [self.analyze(text) for text in texts]
-        return await asyncio.gather(*tasks) 
\ No newline at end of file
+        # Analysis is CPU-bound, so a plain loop avoids per-text coroutine overhead
+        return [self._analyze_sync(text) for text in texts] 
\ No newline at end of file
@@ -1,3 +1,4 @@
+import asyncio
 import os
 from typing import Dict, Any, Optional
 from supabase import create_client, Client
@@ -15,13 +16,18 @@ class SupabaseClient:
         if not supabase_url or not supabase_key:
             raise ValueError("Supabase URL and service role key are required")
         
+        # supabase-py's Client is synchronous: run its queries through _execute
         self.client: Client = create_client(supabase_url, supabase_key)
         logger.info("SupabaseClient initialized")
     
+    async def _execute(self, query):
+        """Execute a blocking query in a worker thread so the event loop stays free."""
+        return await asyncio.to_thread(query.execute)
+    
     async def update_comment_analysis(self, comment_id: str, analysis_data: Dict[str, Any]) -> bool:
         """Update comment with ML analysis results."""
         try:
-            response = self.client.table('comments').update(analysis_data).eq('id', comment_id).execute()
+            response = await self._execute(self.client.table('comments').update(analysis_data).eq('id', comment_id))
             
             if response.data:
                 logger.info(f"Successfully updated analysis for comment {comment_id}")
@@ -37,7 +43,7 @@ class SupabaseClient:
     async def get_comment(self, comment_id: str) -> Optional[Dict[str, Any]]:
         """Get comment by ID."""
         try:
-            response = self.client.table('comments').select('*').eq('id', comment_id).single().execute()
+            response = await self._execute(self.client.table('comments').select('*').eq('id', comment_id).single())
             
             if response.data:
                 return response.data
@@ -52,7 +58,7 @@ class SupabaseClient:
     async def get_unanalyzed_comments(self, limit: int = 100) -> list:
         """Get comments that haven't been analyzed yet."""
         try:
-            response = self.client.table('comments').select('*').is_('sentiment', 'null').limit(limit).execute()
+            response = await self._execute(self.client.table('comments').select('id,content').is_('sentiment', 'null').limit(limit))
             
             return response.data or []
             
@@ -61,13 +67,17 @@ class SupabaseClient:
             return []
     
     async def batch_update_comments(self, updates: list) -> bool:
-        """Update multiple comments in batch."""
+        """Update multiple comments in one round-trip via the batch_update_comment_analysis RPC."""
         try:
-            for update in updates:
-                comment_id = update.pop('id')
-                await self.update_comment_analysis(comment_id, update)
+            response = await self._execute(self.client.rpc('batch_update_comment_analysis', {'updates': updates}))
+            
+            # The RPC returns how many comments it updated; missing ids and malformed rows are skipped
+            updated = response.data or 0
+            if updated != len(updates):
+                logger.error(f"Batch update wrote {updated} of {len(updates)} comments")
+                return False
             
-            logger.info(f"Batch updated {len(updates)} comments")
+            logger.info(f"Batch updated {updated} of {len(updates)} comments")
             return True
             
         except Exception as e:
@@ -77,7 +87,7 @@ class SupabaseClient:
     async def log_analysis_job(self, job_data: Dict[str, Any]) -> bool:
         """Log analysis job for tracking."""
         try:
-            response = self.client.table('analysis_jobs').insert(job_data).execute()
+            response = await self._execute(self.client.table('analysis_jobs').insert(job_data))
             
             if response.data:
                 logger.info(f"Analysis job logged: {job_data.get('job_id')}")
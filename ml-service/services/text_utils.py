@@ -0,0 +1,19 @@
+import hashlib
+from typing import Tuple
+
+# Only short texts are cached by exact content; duplicates ('first!', 'lol', emoji) are short
+MAX_CACHED_TEXT_LENGTH = 256
+
+def content_key(text: str) -> bytes:
+    """Return a compact cache key for comment text, ignoring surrounding whitespace."""
+    return hashlib.blake2b(text.strip().encode('utf-8'), digest_size=16).digest()
+
+def to_lower(text: str) -> str:
+    """Lowercase text, returning it unchanged (no copy) when it is already lowercase."""
+    # islower() is True only if every cased character is lowercase, so lower() would be a no-op
+    return text if text.islower() else text.lower()
+
+def prepare_text(text: str) -> Tuple[str, bytes]:
+    """Lowercase text once and return it with its UTF-8 encoding for byte-level scanners."""
+    text_lower = to_lower(text)
+    return text_lower, text_lower.encode('utf-8')
@@ -1,97 +1,159 @@
-import asyncio
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Set
 from collections import Counter
+from operator import itemgetter
+import heapq
 import logging
+import ahocorasick
+from cachetools import LRUCache
+from services.text_utils import MAX_CACHED_TEXT_LENGTH, to_lower
 
 logger = logging.getLogger(__name__)
 
+# Predefined theme categories with keywords
+_THEME_KEYWORDS = {
+    'appreciation': ['love', 'amazing', 'awesome', 'great', 'fantastic', 'wonderful', 'excellent', 'brilliant'],
+    'criticism': ['bad', 'terrible', 'awful', 'horrible', 'worst', 'disappointing', 'boring'],
+    'questions': ['why', 'how', 'what', 'when', 'where', 'who', '?'],
+    'suggestions': ['should', 'could', 'would', 'try', 'maybe', 'suggest', 'idea', 'think'],
+    'personal_story': ['i', 'me', 'my', 'myself', 'personal', 'experience', 'story'],
+    'technical': ['code', 'programming', 'software', 'bug', 'feature', 'technical', 'algorithm'],
+    'entertainment': ['funny', 'hilarious', 'laugh', 'lol', 'haha', 'comedy', 'entertainment'],
+    'educational': ['learn', 'tutorial', 'explain', 'understand', 'knowledge', 'education'],
+    'emotional': ['feel', 'emotion', 'sad', 'happy', 'angry', 'excited', 'worried'],
+    'community': ['everyone', 'community', 'together', 'group', 'people', 'fans'],
+    'requests': ['please', 'can you', 'request', 'want', 'need', 'hope'],
+    'spam': ['subscribe', 'like', 'follow', 'check out', 'click', 'link', 'promo']
+}
+
+# Common stop words to filter out
+_STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 
+    'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 
+    'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'must',
+    'this', 'that', 'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they'
+})
+
+# Punctuation (everything but word characters, whitespace and apostrophes) becomes a space.
+# The translate table covers ASCII only, so it stays fixed in size; other text uses the regex
+_PUNCT_TABLE = str.maketrans({
+    ch: ' ' for ch in map(chr, range(128))
+    if not (ch.isalnum() or ch.isspace() or ch in "_'")
+})
+_PUNCT_RE = re.compile(r"[^\w\s']")
+
 class ThemeExtractor:
     """Theme and topic extraction service."""
     
     def __init__(self):
-        # Predefined theme categories with keywords
-        self.theme_keywords = {
-            'appreciation': ['love', 'amazing', 'awesome', 'great', 'fantastic', 'wonderful', 'excellent', 'brilliant'],
-            'criticism': ['bad', 'terrible', 'awful', 'horrible', 'worst', 'disappointing', 'boring'],
-            'questions': ['why', 'how', 'what', 'when', 'where', 'who', '?'],
-            'suggestions': ['should', 'could', 'would', 'try', 'maybe', 'suggest', 'idea', 'think'],
-            'personal_story': ['i', 'me', 'my', 'myself', 'personal', 'experience', 'story'],
-            'technical': ['code', 'programming', 'software', 'bug', 'feature', 'technical', 'algorithm'],
-            'entertainment': ['funny', 'hilarious', 'laugh', 'lol', 'haha', 'comedy', 'entertainment'],
-            'educational': ['learn', 'tutorial', 'explain', 'understand', 'knowledge', 'education'],
-            'emotional': ['feel', 'emotion', 'sad', 'happy', 'angry', 'excited', 'worried'],
-            'community': ['everyone', 'community', 'together', 'group', 'people', 'fans'],
-            'requests': ['please', 'can you', 'request', 'want', 'need', 'hope'],
-            'spam': ['subscribe', 'like', 'follow', 'check out', 'click', 'link', 'promo']
+        self.theme_keywords = _THEME_KEYWORDS
+        self.stop_words = _STOP_WORDS
+        
+        # Content cues used to pick fallback themes when no theme keyword matches
+        self.content_cues = {
+            'questions': ['?', 'why', 'how', 'what', 'when', 'where'],
+            'emotional': ['feel', 'love', 'hate', 'sad', 'happy', 'angry', 'excited'],
+            'personal_story': ['i ', 'me ', 'my ', 'myself'],
+            'appreciation': ['great', 'awesome', 'love', 'amazing', 'excellent'],
+            'criticism': ['bad', 'terrible', 'awful', 'hate', 'worst']
         }
         
-        # Common stop words to filter out
-        self.stop_words = {
-            'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 
-            'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had', 
-            'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'must',
-            'this', 'that', 'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they'
+        # Sentiment for themes whose sentiment does not depend on the text
+        self._theme_sentiment_fixed: Dict[str, str] = {
+            theme: 'positive' if theme in ('appreciation', 'entertainment') else 'neutral'
+            for theme in self.theme_keywords
+            if theme not in ('criticism', 'emotional')
         }
+        # Criticism and emotional themes are negative only when one of these words appears;
+        # the automaton finds the first one in a single early-exit pass
+        self._neg_indicators = ('bad', 'terrible', 'sad', 'angry', 'hate')
+        self._neg_ac = ahocorasick.Automaton()
+        for word in self._neg_indicators:
+            self._neg_ac.add_word(word, word)
+        self._neg_ac.make_automaton()
+        
+        # Keywords map to theme ids, which index the per-text score list
+        self._theme_names: List[str] = list(self.theme_keywords)
+        self._kw2theme: Dict[str, int] = {}
+        
+        # One Aho-Corasick automaton finds every theme keyword and content cue in a single pass
+        self._ac = ahocorasick.Automaton()
+        for theme_id, keywords in enumerate(self.theme_keywords.values()):
+            for keyword in keywords:
+                self._kw2theme[keyword] = theme_id
+                self._ac.add_word(keyword, keyword)
+        self._cue_words = frozenset(cue for cues in self.content_cues.values() for cue in cues)
+        for cue in self._cue_words:
+            self._ac.add_word(cue, cue)
+        self._ac.make_automaton()
+        
+        # Duplicate short comments skip extraction entirely; themes are stored as tuples
+        self._cache = LRUCache(maxsize=10_000)
         
         logger.info("ThemeExtractor initialized")
     
     async def extract_themes(self, text: str, max_themes: int = 5) -> List[str]:
         """Extract main themes from text."""
+        return self._extract_themes_sync(text, max_themes)
+    
+    def _extract_themes_sync(self, text: str, max_themes: int = 5) -> List[str]:
+        """Synchronous theme extraction shared by single and batch calls."""
+        cacheable = len(text) < MAX_CACHED_TEXT_LENGTH
+        if cacheable:
+            cached = self._cache.get((text, max_themes))
+            if cached is not None:
+                return list(cached)
+        
         try:
-            text_lower = text.lower()
-            detected_themes = []
+            text_lower = to_lower(text)
             
-            # Check for predefined themes
-            for theme, keywords in self.theme_keywords.items():
-                score = 0
-                for keyword in keywords:
-                    # Count keyword occurrences
-                    if keyword in text_lower:
-                        score += text_lower.count(keyword)
-                
-                if score > 0:
-                    detected_themes.append((theme, score))
+            # Count keyword occurrences per theme; like str.count, occurrences
+            # of the same keyword may not overlap
+            scores = [0] * len(self._theme_names)
+            cues = set()
+            next_start = {}
+            for end, keyword in self._ac.iter(text_lower):
+                if keyword in self._cue_words:
+                    cues.add(keyword)
+                theme_id = self._kw2theme.get(keyword)
+                if theme_id is None:
+                    continue
+                start = end - len(keyword) + 1
+                if start >= next_start.get(keyword, 0):
+                    next_start[keyword] = end + 1
+                    scores[theme_id] += 1
             
-            # Sort by score and return top themes
-            detected_themes.sort(key=lambda x: x[1], reverse=True)
-            themes = [theme for theme, score in detected_themes[:max_themes]]
+            # Sort by score and return top themes (the stable sort keeps theme order for ties)
+            detected_ids = sorted(
+                (theme_id for theme_id, score in enumerate(scores) if score > 0),
+                key=scores.__getitem__,
+                reverse=True
+            )
+            themes = [self._theme_names[i] for i in detected_ids[:max_themes]]
             
-            # If no themes detected, try to extract based on content analysis
+            # If no themes detected, fall back to the content cues from the same scan
             if not themes:
-                themes = await self._extract_content_themes(text_lower)
+                themes = self._extract_content_themes(cues)
             
+            if cacheable:
+                self._cache[(text, max_themes)] = tuple(themes)
             return themes
             
         except Exception as e:
             logger.error(f"Theme extraction error: {str(e)}")
             return []
     
-    async def _extract_content_themes(self, text: str) -> List[str]:
-        """Extract themes based on content analysis."""
-        themes = []
-        
-        # Question detection
-        if '?' in text or any(word in text for word in ['why', 'how', 'what', 'when', 'where']):
-            themes.append('questions')
-        
-        # Emotional content
-        emotional_words = ['feel', 'love', 'hate', 'sad', 'happy', 'angry', 'excited']
-        if any(word in text for word in emotional_words):
-            themes.append('emotional')
-        
-        # Personal content
-        personal_indicators = ['i ', 'me ', 'my ', 'myself']
-        if any(indicator in text for indicator in personal_indicators):
-            themes.append('personal_story')
+    def _extract_content_themes(self, cues: Set[str]) -> List[str]:
+        """Extract themes from the content cues found during the keyword scan."""
+        themes = [
+            theme for theme in ('questions', 'emotional', 'personal_story')
+            if not cues.isdisjoint(self.content_cues[theme])
+        ]
         
         # Appreciation/criticism
-        positive_words = ['great', 'awesome', 'love', 'amazing', 'excellent']
-        negative_words = ['bad', 'terrible', 'awful', 'hate', 'worst']
-        
-        if any(word in text for word in positive_words):
+        if not cues.isdisjoint(self.content_cues['appreciation']):
             themes.append('appreciation')
-        elif any(word in text for word in negative_words):
+        elif not cues.isdisjoint(self.content_cues['criticism']):
             themes.append('criticism')
         
         return themes[:3]  # Return top 3 content-based themes
@@ -100,28 +162,28 @@ class ThemeExtractor:
         """Extract important keywords from text."""
         try:
             # Clean and tokenize text
-            text_lower = text.lower()
+            text_lower = to_lower(text)
             # Remove punctuation except apostrophes
-            cleaned_text = re.sub(r"[^\w\s']", ' ', text_lower)
-            words = cleaned_text.split()
+            if text_lower.isascii():
+                cleaned_text = text_lower.translate(_PUNCT_TABLE)
+            else:
+                cleaned_text = _PUNCT_RE.sub(' ', text_lower)
             
-            # Filter out stop words and short words
-            filtered_words = [
-                word for word in words 
+            # Count word frequencies, filtering out stop words and short words
+            word_counts = Counter(
+                word for word in cleaned_text.split()
                 if len(word) > 2 and word not in self.stop_words
-            ]
-            
-            # Count word frequencies
-            word_counts = Counter(filtered_words)
+            )
+            total = sum(word_counts.values())
             
             # Get top keywords
-            top_keywords = word_counts.most_common(max_keywords)
+            top_keywords = heapq.nlargest(max_keywords, word_counts.items(), key=itemgetter(1))
             
             keywords = [
                 {
                     'word': word,
                     'count': count,
-                    'relevance': count / len(filtered_words) if filtered_words else 0
+                    'relevance': count / total if total else 0
                 }
                 for word, count in top_keywords
             ]
@@ -136,21 +198,17 @@ class ThemeExtractor:
         """Analyze sentiment for each detected theme."""
         try:
             theme_sentiments = {}
+            has_neg = None
             
             for theme in themes:
-                if theme in self.theme_keywords:
-                    # Simple sentiment based on theme keywords
-                    if theme in ['appreciation', 'entertainment']:
-                        theme_sentiments[theme] = 'positive'
-                    elif theme in ['criticism', 'emotional']:
-                        # Need more analysis for emotional themes
-                        negative_indicators = ['bad', 'terrible', 'sad', 'angry', 'hate']
-                        if any(word in text.lower() for word in negative_indicators):
-                            theme_sentiments[theme] = 'negative'
-                        else:
-                            theme_sentiments[theme] = 'neutral'
-                    else:
-                        theme_sentiments[theme] = 'neutral'
+                sentiment = self._theme_sentiment_fixed.get(theme)
+                if sentiment is None and theme in self.theme_keywords:
+                    # Scan for negative words at most once, and only if needed
+                    if has_neg is None:
+                        has_neg = next(self._neg_ac.iter(to_lower(text)), None) is not None
+                    sentiment = 'negative' if has_neg else 'neutral'
+                if sentiment is not None:
+                    theme_sentiments[theme] = sentiment
             
             return theme_sentiments
             
@@ -160,5 +218,5 @@ class ThemeExtractor:
     
     async def batch_extract_themes(self, texts: List[str]) -> List[List[str]]:
         """Extract themes from multiple texts in batch."""
-        tasks = [self.extract_themes(text) for text in texts]
-        return await asyncio.gather(*tasks) 
\ No newline at end of file
+        # Extraction is CPU-bound, so a plain loop avoids per-text coroutine overhead
+        return [self._extract_themes_sync(text) for text in texts] 
\ No newline at end of file
@@ -1,97 +1,160 @@
-import asyncio
 import re
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Set
+from bisect import bisect_right
 import logging
+import threading
+from cachetools import LRUCache
+from services.text_utils import MAX_CACHED_TEXT_LENGTH, prepare_text
+from services.hyperscan_cache import compile_database, hyperscan, scan
 
 logger = logging.getLogger(__name__)
 
+# Basic toxic word patterns (in production, use more sophisticated models)
+_TOXIC_PATTERNS = (
+    r'\b(hate|stupid|idiot|dumb|moron)\b',
+    r'\b(kill\s+yourself|kys)\b',
+    r'\b(f[*u]ck|sh[*i]t|damn)\b',
+    r'\b(racist|sexist|homophobic)\b',
+    r'\b(die|death|suicide)\b'
+)
+
+_SEVERITY_WEIGHTS = {
+    'mild': 0.3,
+    'moderate': 0.6,
+    'severe': 0.9
+}
+
+# Severity and category of each pattern, indexed by pattern index
+_PATTERN_SEVERITY = (
+    'moderate',  # hate, stupid, etc.
+    'severe',    # kill yourself
+    'mild',      # profanity
+    'severe',    # discriminatory
+    'severe'     # death-related
+)
+
+_CATEGORY = (
+    'offensive_language',
+    'self_harm',
+    'profanity',
+    'discrimination',
+    'violence'
+)
+
+# Five or more repeats of the same character ("noooooo")
+_REPEATED_CHAR = re.compile(r'(.)\1{4,}')
+
 class ToxicityDetector:
     """Toxicity detection service using pattern matching and word lists."""
     
     def __init__(self):
-        # Basic toxic word patterns (in production, use more sophisticated models)
-        self.toxic_patterns = [
-            r'\b(hate|stupid|idiot|dumb|moron)\b',
-            r'\b(kill\s+yourself|kys)\b',
-            r'\b(f[*u]ck|sh[*i]t|damn)\b',
-            r'\b(racist|sexist|homophobic)\b',
-            r'\b(die|death|suicide)\b'
-        ]
+        self.toxic_patterns = _TOXIC_PATTERNS
+        self.severity_weights = _SEVERITY_WEIGHTS
+        self.pattern_severity = _PATTERN_SEVERITY
+        
+        # Fuse all patterns into one alternation; match.lastgroup ("g<i>") names the pattern.
+        # Patterns are lowercase and always run against lowercased text, so no case folding
+        self._fused = re.compile(
+            "|".join(f"(?P<g{i}>{pattern})" for i, pattern in enumerate(self.toxic_patterns))
+        )
         
-        self.severity_weights = {
-            'mild': 0.3,
-            'moderate': 0.6,
-            'severe': 0.9
-        }
+        # Scan all patterns in one Hyperscan pass when available
+        self._db = self._build_hyperscan_db()
+        self._hs_local = threading.local()
         
-        # Categorize patterns by severity
-        self.pattern_severity = {
-            0: 'moderate',  # hate, stupid, etc.
-            1: 'severe',    # kill yourself
-            2: 'mild',      # profanity
-            3: 'severe',    # discriminatory
-            4: 'severe'     # death-related
-        }
+        # Duplicate short comments skip analysis entirely
+        self._cache = LRUCache(maxsize=10_000)
+        
+        logger.info(f"ToxicityDetector initialized ({'hyperscan' if self._db else 're'} backend)")
+    
+    def _build_hyperscan_db(self):
+        """Compile the toxic patterns into one Hyperscan database keyed by pattern index."""
+        if hyperscan is None:
+            return None
         
-        logger.info("ToxicityDetector initialized")
+        # Hyperscan's \b and \s are ASCII-only, so only ASCII text is scanned with it
+        flags = hyperscan.HS_FLAG_SOM_LEFTMOST | hyperscan.HS_FLAG_UTF8
+        try:
+            return compile_database([pattern.encode('utf-8') for pattern in self.toxic_patterns], flags)
+        except Exception as e:
+            logger.warning(f"Hyperscan unavailable, falling back to re: {str(e)}")
+            return None
     
     async def analyze(self, text: str) -> float:
         """Analyze toxicity level of text (0.0 to 1.0)."""
+        return self._analyze_sync(text)
+    
+    def _analyze_sync(self, text: str) -> float:
+        """Synchronous toxicity analysis shared by single and batch calls."""
+        cacheable = len(text) < MAX_CACHED_TEXT_LENGTH
+        if cacheable:
+            cached = self._cache.get(text)
+            if cached is not None:
+                return cached
+        
         try:
-            text_lower = text.lower()
-            toxicity_score = 0.0
-            matches = []
-            
-            # Check each pattern
-            for i, pattern in enumerate(self.toxic_patterns):
-                if re.search(pattern, text_lower, re.IGNORECASE):
-                    severity = self.pattern_severity[i]
-                    weight = self.severity_weights[severity]
-                    toxicity_score = max(toxicity_score, weight)
-                    matches.append({
-                        'pattern': pattern,
-                        'severity': severity,
-                        'weight': weight
-                    })
-            
-            # Additional heuristics
-            # All caps (shouting)
-            if len(text) > 10 and text.isupper():
-                toxicity_score += 0.1
-            
-            # Multiple exclamation marks
-            if text.count('!') > 3:
-                toxicity_score += 0.05
-            
-            # Excessive repetition of characters
-            if re.search(r'(.)\1{4,}', text):
-                toxicity_score += 0.05
+            text_lower, data = prepare_text(text)
             
-            # Cap at 1.0
-            toxicity_score = min(toxicity_score, 1.0)
+            # Check all patterns in a single pass; non-ASCII text needs re's Unicode \b and \s
+            if self._db is not None and data.isascii():
+                matched = {pattern_index for pattern_index, _, _ in scan(self._db, data, self._hs_local)}
+            else:
+                matched = {self._pattern_index(match) for match in self._fused.finditer(text_lower)}
             
+            toxicity_score = self._score(text, matched)
+            if cacheable:
+                self._cache[text] = toxicity_score
             return toxicity_score
             
         except Exception as e:
             logger.error(f"Toxicity analysis error: {str(e)}")
             return 0.0
     
+    def _score(self, text: str, matched: Set[int]) -> float:
+        """Combine the worst matched pattern severity with the shouting/repetition heuristics."""
+        toxicity_score = 0.0
+        for i in matched:
+            severity = self.pattern_severity[i]
+            toxicity_score = max(toxicity_score, self.severity_weights[severity])
+        
+        # Additional heuristics
+        # All caps (shouting)
+        if len(text) > 10 and text.isupper():
+            toxicity_score += 0.1
+        
+        # Multiple exclamation marks
+        if text.count('!') > 3:
+            toxicity_score += 0.05
+        
+        # Excessive repetition of characters
+        if _REPEATED_CHAR.search(text):
+            toxicity_score += 0.05
+        
+        # Cap at 1.0
+        return min(toxicity_score, 1.0)
+    
     async def get_toxic_elements(self, text: str) -> List[Dict[str, Any]]:
         """Get specific toxic elements found in text."""
         try:
-            text_lower = text.lower()
+            text_lower, data = prepare_text(text)
             elements = []
             
-            for i, pattern in enumerate(self.toxic_patterns):
-                matches = re.finditer(pattern, text_lower, re.IGNORECASE)
-                for match in matches:
-                    elements.append({
-                        'text': match.group(),
-                        'start': match.start(),
-                        'end': match.end(),
-                        'severity': self.pattern_severity[i],
-                        'category': self._get_category(i)
-                    })
+            # Scan once for (pattern index, start, end) spans; byte and character
+            # offsets coincide on the ASCII text Hyperscan is used for
+            if self._db is not None and data.isascii():
+                spans = scan(self._db, data, self._hs_local)
+            else:
+                spans = [(self._pattern_index(match), match.start(), match.end()) for match in self._fused.finditer(text_lower)]
+            
+            # Keep elements grouped by pattern, in text order within each pattern
+            for i, start, end in sorted(spans):
+                elements.append({
+                    'text': text_lower[start:end],
+                    'start': start,
+                    'end': end,
+                    'severity': self.pattern_severity[i],
+                    'category': self._get_category(i)
+                })
             
             return elements
             
@@ -99,18 +162,60 @@ class ToxicityDetector:
             logger.error(f"Toxic elements analysis error: {str(e)}")
             return []
     
+    def _pattern_index(self, match: re.Match) -> int:
+        """Get the toxic pattern index for a match of the fused regex."""
+        return int(match.lastgroup[1:])
+    
     def _get_category(self, pattern_index: int) -> str:
         """Get category name for pattern index."""
-        categories = {
-            0: 'offensive_language',
-            1: 'self_harm',
-            2: 'profanity',
-            3: 'discrimination',
-            4: 'violence'
-        }
-        return categories.get(pattern_index, 'other')
+        return _CATEGORY[pattern_index] if 0 <= pattern_index < len(_CATEGORY) else 'other'
     
     async def batch_analyze(self, texts: List[str]) -> List[float]:
         """Analyze multiple texts in batch."""
-        tasks = [self.analyze(text) for text in texts]
-        return await asyncio.gather(*tasks) 
\ No newline at end of file
+        if self._db is not None and len(texts) > 1:
+            return self._batch_analyze_joined(texts)
+        # Analysis is CPU-bound, so a plain loop avoids per-text coroutine overhead
+        return [self._analyze_sync(text) for text in texts]
+    
+    def _batch_analyze_joined(self, texts: List[str]) -> List[float]:
+        """Score a batch with one Hyperscan scan over the uncached ASCII texts joined by NUL bytes."""
+        try:
+            results = [
+                self._cache.get(text) if len(text) < MAX_CACHED_TEXT_LENGTH else None
+                for text in texts
+            ]
+            
+            # No pattern matches NUL, so matches never span two texts and \b
+            # behaves as it does at the ends of a single text
+            scanned = []
+            starts = []
+            chunks = []
+            offset = 0
+            for i, result in enumerate(results):
+                if result is not None:
+                    continue
+                data = prepare_text(texts[i])[1]
+                if not data.isascii():
+                    # Hyperscan's \b and \s are ASCII-only, so analyze these with re
+                    results[i] = self._analyze_sync(texts[i])
+                    continue
+                scanned.append(i)
+                starts.append(offset)
+                chunks.append(data)
+                offset += len(data) + 1
+            
+            matched = [set() for _ in scanned]
+            for pattern_index, start, _ in scan(self._db, b"\x00".join(chunks), self._hs_local):
+                matched[bisect_right(starts, start) - 1].add(pattern_index)
+            
+            for i, text_matched in zip(scanned, matched):
+                text = texts[i]
+                results[i] = self._score(text, text_matched)
+                if len(text) < MAX_CACHED_TEXT_LENGTH:
+                    self._cache[text] = results[i]
+            
+            return results
+            
+        except Exception as e:
+            logger.error(f"Batch toxicity analysis error: {str(e)}")
+            return [self._analyze_sync(text) for text in texts] 
\ No newline at end of file
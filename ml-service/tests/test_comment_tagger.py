@@ -0,0 +1,93 @@
+import asyncio
+import re
+
+import pytest
+
+from services import comment_tagger
+from services.comment_tagger import CommentTagger
+
+# Timestamp Reference patterns as written before the shared prefixes were factored out
+ORIGINAL_TIMESTAMP_PATTERNS = [
+    r"\b(\d{1,2}:\d{2}|timestamp|at \d{1,2}:\d{2}|minute \d+|second \d+|\d+:\d+ had me|at \d+:\d+)\b",
+    r"\b(time \d+:\d+|mark \d+:\d+|around \d+:\d+|near \d+:\d+|about \d+:\d+)\b"
+]
+
+CORPUS = [
+    "This tutorial was amazing, thanks!",
+    "I wish you could add dark mode, it would be great if the app had it",
+    "What does this mean? I don't understand the second half",
+    "The part at 3:45 had me dying lol",
+    "Around 12:30 he explains the whole thing",
+    "minute 5 is the best part",
+    "@sarah_k you have to watch this",
+    "email me at bob@example.com",
+    "Visit my channel and follow me for more content",
+    "you're an idiot and this is misleading",
+    "That's wrong, the error is in the editing not the audio",
+    "Great video but the music was too loud",
+    "Such a legendary throwback, good times",
+    "Politics and religion in one comment, here we go",
+    "I'm so frustrated and upset with this take",
+    "Can you do a part 2 about the restaurant in the next video?",
+    "timestamp please",
+    "Time 1:02:03 mark 4:05 near 6:07 about 8:09",
+    "second 30 and 10:61",
+    "12:345 and 1234:56",
+    "sub5:00 x10:00y",
+    "haha hilarious meme",
+    "plain words here",
+    "",
+    "   ?   ",
+    "TOXIC AND RUDE!!!",
+]
+
+TIMESTAMP_SAMPLES = [
+    prefix + time + suffix
+    for prefix in ["", "at ", "time ", "mark ", "around ", "near ", "about ", "minute ", "second ", "x", "at  "]
+    for time in ["3:45", "12:30", "123:45", "1:2", "5", "99", "1:02:03", "timestamp", ":30"]
+    for suffix in ["", " had me", " had", "s", "!", " lol"]
+]
+
+# Hand-checked tags, in priority order, covering keyword, emoji, @mention and timestamp matches
+PINNED_TAGS = [
+    ("This tutorial was amazing, thanks!", ["Product Praise", "Praise for Video"]),
+    ("I wish you could add dark mode", ["Feature Request"]),
+    ("Visit my channel for more", ["Spam"]),
+    ("you're an idiot", ["Hate Speech", "Toxicity"]),
+    ("lol 😂 so funny", ["Inside Joke/Meme"]),
+    ("ok😂ok", ["Inside Joke/Meme"]),
+    ("😂😂😂", []),
+    ("Café food looks great 😋", ["Product Praise", "Requests/Ideas"]),
+    ("@sarah_k you have to watch this", ["Community Interaction"]),
+    ("email me at bob@example.com", ["Community Interaction"]),
+    ("The part at 3:45 had me dying", ["Timestamp Reference"]),
+    ("Around 12:30 he explains it", ["Timestamp Reference"]),
+    ("minute 5 is the best part", ["Product Praise", "Timestamp Reference"]),
+    ("Time 1:02:03", ["Timestamp Reference"]),
+    ("plain words here", []),
+    ("", []),
+]
+
+@pytest.fixture(scope="module")
+def tagger():
+    return CommentTagger()
+
+def _any_match(patterns, text):
+    return any(re.search(pattern, text.lower()) for pattern in patterns)
+
+@pytest.mark.skipif(comment_tagger._HYPERSCAN_DB is None, reason="Hyperscan is not available")
+@pytest.mark.parametrize("text", CORPUS + TIMESTAMP_SAMPLES)
+def test_hyperscan_matches_keyword_matcher(tagger, text):
+    assert text.isascii()
+    assert tagger._scan_categories(text) == tagger._match_categories(text)
+
+@pytest.mark.parametrize("text", CORPUS + TIMESTAMP_SAMPLES)
+def test_timestamp_patterns_match_original(text):
+    current = CommentTagger.TAG_PATTERNS["Timestamp Reference"]
+    assert _any_match(current, text) == _any_match(ORIGINAL_TIMESTAMP_PATTERNS, text)
+
+@pytest.mark.parametrize("text,expected", PINNED_TAGS)
+def test_tag_comment(tagger, text, expected):
+    result = asyncio.run(tagger.tag_comment(text))
+    assert result["tags"] == expected
+    assert result["primary_tag"] == (expected[0] if expected else None)